@@ -1,34 +1,123 @@
 import asyncio
-from rich.progress import Progress
+import weakref
 from types import TracebackType  # For type hinting __aexit__
-from typing import Optional, Type, Any # Added Any for __init__ args
+from typing import Optional, Type, Any, Coroutine, List, Dict, TYPE_CHECKING
 import logging
 
+if TYPE_CHECKING:
+    # rich is imported lazily (only when a Progress is actually created) so
+    # importing this module stays cheap for callers that never show a bar
+    from rich.progress import Progress, TaskID
+
 log = logging.getLogger("progress_context_wrapper")
 
+_REFRESH_INTERVAL = 0.05 # Minimum seconds between progress bar refreshes
+
+
+class _ProgressCoalescer:
+    """
+    Batches progress.update calls from many concurrent wrappers sharing one
+    Progress. Writers only record the latest fields per task line (a plain
+    dict write); a single background task pushes them to rich every
+    `interval` seconds, so rich sees one update per line per tick no matter
+    how many completions happened in between.
+    """
+    def __init__(self, progress: "Progress", interval: float = _REFRESH_INTERVAL):
+        self.progress = progress
+        self.interval = interval
+        self.state: Dict["TaskID", Dict[str, Any]] = {}
+        self._runner: Optional[asyncio.Task] = None
+
+    def set(self, task_id: "TaskID", **fields: Any) -> None:
+        """Records fields for the next flush (same keywords as progress.update)."""
+        pending = self.state.get(task_id)
+        if pending is None:
+            self.state[task_id] = fields
+        else:
+            pending.update(fields)
+
+    def discard(self, task_id: "TaskID") -> None:
+        """Drops anything still pending for a task line."""
+        self.state.pop(task_id, None)
+
+    def flush(self) -> None:
+        """Pushes all pending fields to the Progress."""
+        state, self.state = self.state, {}
+        for task_id, fields in state.items():
+            try:
+                self.progress.update(task_id, **fields)
+            except Exception as e:
+                log.warning(f"Failed to update progress bar for task {task_id}: {e}")
+
+    def start(self) -> None:
+        """Starts the background flush loop (needs a running event loop)."""
+        self._runner = asyncio.create_task(self._run(), name="progress_coalescer")
+
+    async def stop(self) -> None:
+        """Stops the flush loop and pushes whatever is still pending."""
+        if self._runner is not None:
+            self._runner.cancel()
+            await asyncio.gather(self._runner, return_exceptions=True)
+            self._runner = None
+        self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            self.flush()
+
+
+# Coalescers of the Progress objects currently managed by AsyncProgressContext
+_coalescers: "weakref.WeakKeyDictionary[Progress, _ProgressCoalescer]" = weakref.WeakKeyDictionary()
+
+
 class AsyncProgressContext:
     """
     An asynchronous context manager wrapper for rich.progress.Progress.
     Handles manual start() and stop() for use with 'async with'.
+    While inside the context, the wrappers below route their refreshes
+    through a shared _ProgressCoalescer instead of calling progress.update.
     """
     def __init__(self, *args: Any, **kwargs: Any):
         """
         Initializes the underlying Progress object.
         Accepts the same arguments as rich.progress.Progress.
         """
+        from rich.progress import Progress
+
         # Create the actual Progress instance internally
         self._progress = Progress(*args, **kwargs)
         self._started = False # Track if start was called successfully
+        self._external = False # True when wrapping a Progress started elsewhere
+        self._coalescer: Optional[_ProgressCoalescer] = None
         log.debug(f"AsyncProgressContext created. Internal Progress ID: {id(self._progress)}")
 
-    async def __aenter__(self) -> Progress:
+    @classmethod
+    def wrap(cls, progress: "Progress") -> "AsyncProgressContext":
+        """
+        Wraps an already-running Progress (e.g. one from an outer context) for
+        use with 'async with'. The context neither starts nor stops it, and
+        reuses the outer context's coalescer if there is one.
+        """
+        inst = cls.__new__(cls)
+        inst._progress = progress
+        inst._started = False
+        inst._external = True
+        inst._coalescer = None
+        return inst
+
+    async def __aenter__(self) -> "Progress":
         """Starts the underlying Progress display when entering the context."""
         log.debug(f"Entering AsyncProgressContext.__aenter__ for Progress ID: {id(self._progress)}")
         try:
-            # Start the progress display (idempotent in recent rich versions)
-            # Await might not strictly be needed if start() is sync, but safe.
-            await self._progress.start()
-            self._started = True
+            if not self._external:
+                # Start the progress display (start() is synchronous)
+                self._progress.start()
+                self._started = True
+            if self._progress not in _coalescers: # Nested contexts share one
+                self._coalescer = _ProgressCoalescer(self._progress)
+                self._coalescer.start()
+                _coalescers[self._progress] = self._coalescer
             log.debug(f"Internal Progress {id(self._progress)} started.")
             # Return the underlying Progress object so it can be used with 'as'
             return self._progress
@@ -45,11 +134,14 @@ class AsyncProgressContext:
     ) -> Optional[bool]:
         """Stops the underlying Progress display when exiting the context."""
         log.debug(f"Entering AsyncProgressContext.__aexit__ for Progress ID: {id(self._progress)}")
+        if self._coalescer is not None:
+            _coalescers.pop(self._progress, None)
+            await self._coalescer.stop() # Pushes the last pending updates
+            self._coalescer = None
         # Stop the progress display only if it was successfully started
         if self._started:
             try:
-                # Await might not strictly be needed if stop() is sync, but safe.
-                await self._progress.stop()
+                self._progress.stop() # stop() is synchronous
                 log.debug(f"Internal Progress {id(self._progress)} stopped.")
             except Exception as e:
                  log.error(f"Error stopping Progress {id(self._progress)} in __aexit__: {e}", exc_info=True)
@@ -60,169 +152,531 @@ class AsyncProgressContext:
         return False
 
 
-from typing import Sequence, Dict # Added Dict
+import contextvars
+import inspect
+from concurrent.futures import Executor
+from functools import partial
+from typing import Sequence, Callable, AsyncIterator, Iterable, Tuple, Set
+
+
+def _close_coroutines(items: Iterable[Any]) -> None:
+    """Closes the coroutine items, which will never be scheduled (avoids "never awaited" warnings)."""
+    for item in items:
+        if asyncio.iscoroutine(item):
+            item.close()
+
+
+# A callable may also return a coroutine (e.g. lambda: some_async_func(x));
+# the helpers below await it instead of returning the bare coroutine object.
+
+async def _run_inline(func: Callable[[], Any]) -> Any:
+    """Runs a (non-blocking) callable directly on the event loop."""
+    result = func()
+    if asyncio.iscoroutine(result):
+        result = await result
+    return result
+
+
+async def _run_in_thread(func: Callable[[], Any]) -> Any:
+    """Runs a blocking callable in a worker thread via asyncio.to_thread."""
+    result = await asyncio.to_thread(func)
+    if asyncio.iscoroutine(result):
+        result = await result
+    return result
+
+
+async def _run_in_executor(executor: Executor, func: Callable[[], Any]) -> Any:
+    """Runs a blocking callable on the given executor."""
+    result = await asyncio.get_running_loop().run_in_executor(executor, func)
+    if asyncio.iscoroutine(result):
+        result = await result
+    return result
+
+
+class _TaskLine:
+    """
+    One progress task line and the items behind it. Launches the items
+    (keeping at most max_concurrency running), records each completion from
+    its task's done callback, throttles refreshes of the line and writes its
+    final description. Outcomes are pushed as (line, index, result) onto a
+    queue that several lines may share, so one consumer can drain them all.
+    """
+    def __init__(
+        self,
+        items: Sequence[Coroutine | Callable[[], Any]],
+        description: str,
+        progress: "Progress", # Expects an already started Progress object
+        finished: "asyncio.Queue[Tuple[_TaskLine, int, Any]]",
+        *,
+        return_exceptions: bool = False,
+        inline_sync: bool = False,
+        name_tasks: Optional[bool] = None,
+        executor: Optional[Executor] = None,
+        max_concurrency: Optional[int] = None,
+        eager_start: bool = False,
+        share_context: bool = False
+    ):
+        # Whenever the input is rejected, its coroutines are closed first:
+        # nothing else will ever await them
+        if inline_sync and executor is not None:
+            _close_coroutines(items)
+            raise ValueError("inline_sync and executor are mutually exclusive")
+        if max_concurrency is not None and max_concurrency < 1:
+            _close_coroutines(items)
+            raise ValueError(f"max_concurrency must be at least 1, got {max_concurrency}")
+        self.description = description
+        self.progress = progress
+        self.finished = finished
+        self.return_exceptions = return_exceptions
+        self.inline_sync = inline_sync
+        # By default tasks are only named when someone is debugging
+        self.name_tasks = log.isEnabledFor(logging.DEBUG) if name_tasks is None else name_tasks
+        self.executor = executor
+        self.max_concurrency = max_concurrency
+        self.num_tasks = len(items)
+        self.completed_count = 0
+        self.error_count = 0 # The exceptions themselves only live in the results
+        self.first_exception: Optional[BaseException] = None
+        self.running: Set[asyncio.Future] = set() # Started but not yet finished
+        self.closing = False # Set by shutdown(); its cancellations are not outcomes
+        self._not_started = iter(enumerate(items))
+        if self.num_tasks == 0:
+            log.info(f"'{description}': No coroutines to run.")
+            return
+
+        try:
+            self.task_id: TaskID = progress.add_task(description, total=self.num_tasks, start=True, visible=True)
+        except Exception as e:
+            # Nothing has been started yet; without a line there is no result to report
+            log.error(f"Failed to add progress task '{description}': {e}")
+            _close_coroutines(items)
+            raise
+
+        iscoroutine = asyncio.iscoroutine # Local lookup in the per-item loop
+        for i, coro in enumerate(items):
+            if not iscoroutine(coro) and not callable(coro):
+                progress.update(self.task_id, description=f"[red]✗ {description} (Error: Invalid input)")
+                _close_coroutines(items)
+                raise TypeError(f"Item at index {i} is not a coroutine or callable: {type(coro)}")
+
+        # The running count is left to the bar's columns (e.g. MofNCompleteColumn),
+        # so the description only changes when the error count does. Its
+        # constant parts are formatted once up front.
+        self._errors_prefix = description + " - " # Not a format string: descriptions may contain braces
+        self._success_desc = f"[green]✓ {description} ({self.num_tasks}/{self.num_tasks} success)"
+
+        # Bound once; used on every refresh/completion. Inside AsyncProgressContext
+        # refreshes only record state for the context's shared coalescer.
+        self._coalescer = _coalescers.get(progress)
+        self._update_progress = progress.update if self._coalescer is None else self._coalescer.set
+        self._debug_enabled = log.isEnabledFor(logging.DEBUG) # Skip building debug f-strings otherwise
+
+        self._loop = asyncio.get_running_loop()
+        self._create_task = partial(asyncio.eager_task_factory, self._loop) if eager_start else asyncio.create_task
+        # None lets each task copy the current context as usual
+        self._context = contextvars.copy_context() if share_context else None
+        # Without a coalescer, refreshes are throttled here: completions in the
+        # same loop tick share one, and there is at most one per
+        # _REFRESH_INTERVAL unless update_chunk completions have piled up since
+        # the last one. With a coalescer, its flush loop is the only throttle.
+        self._update_chunk = max(1, self.num_tasks // 200)
+        self._refresh_handle: Optional[asyncio.TimerHandle] = None
+        self._last_refresh = 0.0
+        self._shown_count = 0
+        self._shown_errors = 0
+
+    def start(self) -> None:
+        """Launches the first window of items."""
+        for _ in range(min(self.max_concurrency or self.num_tasks, self.num_tasks)):
+            self._launch_next()
+
+    def _launch_next(self) -> None:
+        """Starts the next item that hasn't been started yet, if any."""
+        entry = next(self._not_started, None)
+        if entry is None:
+            return
+        i, coro = entry
+        try:
+            if not asyncio.iscoroutine(coro):
+                if inspect.iscoroutinefunction(coro):
+                    coro = coro() # Coroutine factory: the frame only exists from here on
+                elif self.inline_sync:
+                    coro = _run_inline(coro)
+                elif self.executor is not None:
+                    coro = _run_in_executor(self.executor, coro)
+                else:
+                    coro = _run_in_thread(coro)
+            task = self._create_task(
+                coro, name=f"{self.description}#{i}" if self.name_tasks else None, context=self._context
+            )
+        except Exception as e:
+            # E.g. a factory called with a missing argument: this item's
+            # outcome, delivered through _record like any other failure
+            if asyncio.iscoroutine(coro):
+                coro.close()
+            task = self._loop.create_future()
+            task.set_exception(e)
+        # The index travels with the callback, so no Task->index map is needed
+        # (partial is C-level, so no extra Python frame per completion)
+        task.add_done_callback(partial(self._record, i))
+        self.running.add(task)
+
+    def _record(self, original_index: int, future: asyncio.Future) -> None:
+        """Queues the outcome of one finished task and schedules a refresh."""
+        self.running.discard(future)
+        if self.closing:
+            return # Cancelled (or overtaken) by shutdown(), nobody is consuming any more
+        try:
+            result = future.result()
+        except BaseException as e:
+            # A cancellation from elsewhere or a BaseException (e.g.
+            # KeyboardInterrupt) is an outcome too, but always re-raised by
+            # the consumer, even with return_exceptions=True
+            self.error_count += 1
+            result = e
+            if self.first_exception is None and (not self.return_exceptions or not isinstance(e, Exception)):
+                self.first_exception = e
+            if self._debug_enabled:
+                log.debug(f"Task item {original_index} in '{self.description}' failed: {e}")
+        finally:
+            self.completed_count += 1
+            if self.completed_count == self.num_tasks:
+                # The last completion goes straight to the final description,
+                # so e.g. a single-item batch costs one update, not two
+                self.finalize()
+            elif self._coalescer is not None:
+                self._push() # Just a dict write; the coalescer flushes it
+            elif self._refresh_handle is None or self.completed_count - self._shown_count >= self._update_chunk:
+                self._schedule_refresh()
+        self.finished.put_nowait((self, original_index, result))
+        if self.first_exception is None:
+            self._launch_next() # Refill the concurrency window
+
+    def _flush(self) -> None:
+        """Throttled refresh: pushes the current counters to the bar."""
+        self._refresh_handle = None
+        self._last_refresh = self._loop.time()
+        self._push()
+
+    def _push(self) -> None:
+        """Writes the current counters to the bar (or the shared coalescer)."""
+        completed_count = self._shown_count = self.completed_count
+        try:
+             if self.error_count == self._shown_errors:
+                 self._update_progress(self.task_id, completed=completed_count)
+             else:
+                 self._shown_errors = self.error_count
+                 self._update_progress(self.task_id, completed=completed_count, description=f"{self._errors_prefix}{self._shown_errors} errors!")
+        except Exception as e:
+             log.warning(f"Failed to update progress bar for task {self.task_id}: {e}")
+
+    def _schedule_refresh(self) -> None:
+        """Queues a _flush within the refresh budget (at most one pending)."""
+        now = self._loop.time()
+        if self.completed_count - self._shown_count >= self._update_chunk:
+            when = now
+        else:
+            when = max(now, self._last_refresh + _REFRESH_INTERVAL)
+        if self._refresh_handle is not None:
+            if self._refresh_handle.when() <= when:
+                return # An earlier refresh is already queued
+            self._refresh_handle.cancel()
+        self._refresh_handle = self._loop.call_at(when, self._flush)
+
+    def finalize(self) -> None:
+        """Sets the final description of the task line."""
+        if self._refresh_handle is not None:
+            # Any refresh still queued is superseded by the final update
+            self._refresh_handle.cancel()
+            self._refresh_handle = None
+        succeeded = self.completed_count - self.error_count
+        if self.error_count:
+             final_desc = f"[red]✗ {self.description} ({self.error_count} errors, {succeeded}/{self.num_tasks} success)"
+        elif self.completed_count == self.num_tasks:
+             final_desc = self._success_desc
+        else:
+             # Closed early (fail-fast elsewhere, or the caller stopped iterating)
+             final_desc = f"[yellow]■ {self.description} (stopped, {succeeded}/{self.num_tasks} success)"
+
+        try:
+            if self._coalescer is not None:
+                self._coalescer.discard(self.task_id) # A stale refresh must not overwrite this
+            self.progress.update(self.task_id, description=final_desc, completed=self.completed_count)
+            # We don't stop the individual task line here, just update it
+            # progress.stop_task(task_id) # Optional: stop the spinner on this line
+        except Exception as e:
+            log.warning(f"Failed to finalize progress bar description for task {self.task_id}: {e}")
+
+    async def shutdown(self) -> None:
+        """Cancels unfinished work and finalizes the line if it didn't complete."""
+        self.closing = True
+        pending = list(self.running)
+        if pending:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        _close_coroutines(coro for _, coro in self._not_started)
+        if self.completed_count < self.num_tasks:
+            self.finalize() # Not every task finished; show the outcome so far
+
+
+async def _shutdown_lines(lines: Sequence[_TaskLine]) -> None:
+    """Cancels whatever is still running on the given lines."""
+    # Cancel whatever is still running (fail-fast, or the caller stopped
+    # iterating) so it doesn't keep holding resources in the background.
+    # This is done by hand rather than with asyncio.TaskGroup: a TaskGroup
+    # held open across 'yield' cancels its parent task on child failure,
+    # and here that parent is the consumer's task, suspended in its own code.
+    for line in lines:
+        await line.shutdown()
+
+
+async def iter_with_progress(
+    coroutines: Sequence[Coroutine | Callable[[], Any]],
+    description: str,
+    progress: "Progress", # Expects an already started Progress object
+    return_exceptions: bool = False,
+    inline_sync: bool = False,
+    name_tasks: Optional[bool] = None,
+    executor: Optional[Executor] = None,
+    max_concurrency: Optional[int] = None,
+    eager_start: bool = False,
+    share_context: bool = False
+) -> AsyncIterator[Tuple[int, Any]]:
+    """
+    Runs a sequence of coroutines concurrently and yields (index, result)
+    pairs in completion order, updating a provided (and already started)
+    rich.progress.Progress object as they finish. Lets callers start
+    downstream work on early results while the rest are still running.
+
+    With return_exceptions=True, failures are yielded as (index, exception);
+    otherwise the first failure cancels the remaining tasks and is raised.
+    Closing the iterator early also cancels whatever is still running.
+    See run_coroutines_with_progress for the accepted item types.
+    name_tasks=True gives each asyncio Task a "<description>#<index>" name
+    for debugging. The default (None) names them only while DEBUG logging is
+    enabled and otherwise leaves them unnamed to save the allocation.
+    With max_concurrency set, at most that many items run at once: the next
+    item is started as each one finishes, so only that many Task objects
+    (and, for callables, coroutine frames) are alive at a time.
+    eager_start=True starts each coroutine synchronously up to its first real
+    suspension (asyncio.eager_task_factory); items that finish right away,
+    e.g. cache hits, are recorded without ever being scheduled on the loop.
+    Only use it for coroutines that are safe to run inside the launching call.
+    share_context=True runs all tasks of a line in one copy of the current
+    contextvars context instead of copying it once per task. Values a task
+    sets are then visible to the others, so only use it for coroutines that
+    don't set context variables (e.g. logger.progress_active_context).
+
+    Completions are delivered by each task's done callback into a single
+    asyncio.Queue drained here (no as_completed wrapper futures), so the hot
+    path is call_soon + Queue - both of which uvloop speeds up considerably.
+    For large batches, running the program under uvloop is recommended
+    (e.g. uvloop.run(main()) instead of asyncio.run(main())).
+    """
+    finished: asyncio.Queue[Tuple[_TaskLine, int, Any]] = asyncio.Queue()
+    line = _TaskLine(
+        coroutines, description, progress, finished,
+        return_exceptions=return_exceptions, inline_sync=inline_sync, name_tasks=name_tasks,
+        executor=executor, max_concurrency=max_concurrency, eager_start=eager_start,
+        share_context=share_context
+    )
+    failure = None
+
+    try:
+        line.start()
+        for _ in range(line.num_tasks):
+            _, original_index, result = await finished.get()
+            if line.first_exception is not None and result is line.first_exception:
+                # Fail fast: stop at the first failure instead of waiting for
+                # the slowest task
+                failure = result
+                break
+            yield original_index, result
+    finally:
+        await _shutdown_lines([line])
+
+    if failure is not None:
+        raise failure
+
 
 # Previous definition of run_coroutines_with_progress
 async def run_coroutines_with_progress(
-    coroutines: Sequence[Coroutine],
+    coroutines: Sequence[Coroutine | Callable[[], Any]],
     description: str,
-    progress: Progress, # Expects an already started Progress object
-    return_exceptions: bool = False
+    progress: "Progress", # Expects an already started Progress object
+    return_exceptions: bool = False,
+    inline_sync: bool = False,
+    result_container: Optional[Callable[[int], Any]] = None,
+    name_tasks: Optional[bool] = None,
+    executor: Optional[Executor] = None,
+    max_concurrency: Optional[int] = None,
+    eager_start: bool = False,
+    share_context: bool = False
 ) -> List[Any]:
     """
     Runs a sequence of coroutines concurrently, updating a provided (and
     already started) rich.progress.Progress object. Handles task creation
     internally. The caller is responsible for starting/stopping the Progress object
     (or using a context manager like AsyncProgressContext).
+    The running count is not part of the task description; include
+    MofNCompleteColumn in the Progress columns to display it.
+
+    Items may also be zero-argument async functions (typically
+    functools.partial(some_async_func, *args)); these are called only when
+    their turn to run comes, so combined with max_concurrency only that many
+    coroutine frames are alive at once instead of one per item. An error
+    raised by the call itself counts as that item's failure.
+    Any other zero-argument callable is treated as blocking and run in a
+    worker thread via asyncio.to_thread; if it returns a coroutine (e.g.
+    lambda: some_async_func(x)), that is awaited on the loop afterwards, so
+    prefer functools.partial, which skips the thread hand-off.
+    Pass inline_sync=True to call them directly on the event loop instead,
+    skipping the thread hand-off - only do this when the caller guarantees
+    the callables return quickly without blocking.
+    For CPU-bound callables, pass a ProcessPoolExecutor (or a dedicated
+    ThreadPoolExecutor) as executor so they don't starve the default thread
+    pool; shutting the executor down remains the caller's responsibility.
+    inline_sync and executor can't be combined (ValueError).
 
-    (Implementation details omitted for brevity - see previous answers
-     for the full code of this function. It adds a task line, creates tasks
-     internally, uses as_completed, updates the task line, finalizes the
-     description, and returns results/exceptions).
+    Collects the output of iter_with_progress into a list in input order.
+    For very large batches, result_container can supply a preallocated
+    indexable container instead, e.g. functools.partial(numpy.empty,
+    dtype=object); it is called once with the number of items.
     """
     num_tasks = len(coroutines)
-    if num_tasks == 0:
-        log.info(f"'{description}': No coroutines to run.")
-        return []
-
-    task_id: Optional[TaskID] = None
-    results = [None] * num_tasks
-    task_futures = []
-    original_indices: Dict[asyncio.Task, int] = {}
-    completed_count = 0
-    exceptions_caught = []
-    first_exception = None
-
-    # --- Step 1: Add the task line to the progress bar ---
+    if result_container is None:
+        results = [None] * num_tasks
+    else:
+        results = result_container(num_tasks)
+    store_result = results.__setitem__ # Bound once for the per-completion store
+    async for original_index, result in iter_with_progress(
+        coroutines, description, progress,
+        return_exceptions=return_exceptions, inline_sync=inline_sync, name_tasks=name_tasks,
+        executor=executor, max_concurrency=max_concurrency, eager_start=eager_start,
+        share_context=share_context
+    ):
+        store_result(original_index, result)
+    return results
+
+
+async def run_tasks_with_progress(
+    group_definitions: Dict[str, Sequence[Coroutine | Callable[[], Any]]],
+    progress: "Progress", # Expects an already started Progress object
+    return_exceptions: bool = False,
+    inline_sync: bool = False,
+    name_tasks: Optional[bool] = None,
+    executor: Optional[Executor] = None,
+    max_concurrency: Optional[int] = None,
+    eager_start: bool = False,
+    share_context: bool = False
+) -> Dict[str, List[Any]]:
+    """
+    Runs several named groups concurrently, one task line per group (the
+    group name is used as its description). The options apply to every
+    group as in run_coroutines_with_progress; max_concurrency is per group.
+    All groups report into one completion queue drained here, so there is
+    no per-group coroutine in between. With return_exceptions=False, the
+    first failure in any group cancels all groups and is raised.
+    Returns {group name: results in input order}.
+    """
+    finished: asyncio.Queue[Tuple[_TaskLine, int, Any]] = asyncio.Queue()
+    results = {name: [None] * len(items) for name, items in group_definitions.items()}
+    lines: List[_TaskLine] = []
+    store_result = {} # line -> bound __setitem__ of that group's results
+    failure = None
     try:
-        task_id = progress.add_task(f"{description} (0/{num_tasks})", total=num_tasks, start=False, visible=True)
-    except Exception as e:
-        log.error(f"Failed to add progress task '{description}': {e}")
-        return [] # Cannot proceed
-
-    # --- Step 2: Create asyncio Tasks Internally ---
-    for i, coro in enumerate(coroutines):
-        if not asyncio.iscoroutine(coro):
-            if task_id is not None:
-                progress.update(task_id, description=f"[red]✗ {description} (Error: Invalid input)")
-            raise TypeError(f"Item at index {i} is not a coroutine: {type(coro)}")
-        task = asyncio.create_task(coro, name=f"{description}_item_{i}")
-        task_futures.append(task)
-        original_indices[task] = i
-
-    # --- Step 3: Monitor Completion using as_completed ---
-    for future in asyncio.as_completed(task_futures):
-        original_index = original_indices[future]
-        try:
-            result = await future
-            results[original_index] = result
-        except Exception as e:
-            exceptions_caught.append(e)
-            results[original_index] = e
-            if not return_exceptions and first_exception is None:
-                first_exception = e
-            log.debug(f"Task item {original_index} in '{description}' failed: {e}")
-        finally:
-            completed_count += 1
-            # --- Step 4: Update Progress Bar Line ---
-            current_desc = f"{description} ({completed_count}/{num_tasks})"
-            if exceptions_caught:
-                 current_desc += f" - {len(exceptions_caught)} errors!"
+        for name, items in group_definitions.items():
             try:
-                 if task_id is not None:
-                     progress.update(task_id, completed=completed_count, description=current_desc)
-            except Exception as e:
-                 log.warning(f"Failed to update progress bar for task {task_id}: {e}")
+                line = _TaskLine(
+                    items, name, progress, finished,
+                    return_exceptions=return_exceptions, inline_sync=inline_sync, name_tasks=name_tasks,
+                    executor=executor, max_concurrency=max_concurrency, eager_start=eager_start,
+                    share_context=share_context
+                )
+            except BaseException:
+                # The groups after this one never got a line to close their coroutines
+                for later_items in list(group_definitions.values())[len(lines) + 1:]:
+                    _close_coroutines(later_items)
+                raise
+            lines.append(line)
+            store_result[line] = results[name].__setitem__
+        for line in lines:
+            line.start()
 
-    # --- Step 5: Finalize Progress Bar Line Description ---
-    final_desc = ""
-    if exceptions_caught:
-         final_desc = f"[red]✗ {description} ({len(exceptions_caught)} errors, {num_tasks - len(exceptions_caught)}/{num_tasks} success)"
-    else:
-         final_desc = f"[green]✓ {description} ({completed_count}/{num_tasks} success)"
+        for _ in range(sum(line.num_tasks for line in lines)):
+            line, original_index, result = await finished.get()
+            if line.first_exception is not None and result is line.first_exception:
+                failure = result # Fail fast across all groups
+                break
+            store_result[line](original_index, result)
+    finally:
+        await _shutdown_lines(lines)
 
-    try:
-        if task_id is not None:
-            progress.update(task_id, description=final_desc, completed=num_tasks)
-            # We don't stop the individual task line here, just update it
-            # progress.stop_task(task_id) # Optional: stop the spinner on this line
-    except Exception as e:
-        log.warning(f"Failed to finalize progress bar description for task {task_id}: {e}")
+    if failure is not None:
+        raise failure
+    return results
 
-    # --- Step 6: Handle Exceptions / Return Results ---
-    if not return_exceptions and first_exception:
-        raise first_exception
-    else:
-        return results
-
-
-import random # Make sure random is imported
-from rich.progress import SpinnerColumn, TextColumn, BarColumn, MofNCompleteColumn, TimeElapsedColumn
-from rich.logging import RichHandler
-from rich.console import Console
-
-# --- Logger Setup (stderr recommended) ---
-log_console = Console(stderr=True)
-logging.basicConfig(level="INFO", format="%(message)s", datefmt="[%X]",
-                    handlers=[RichHandler(console=log_console, show_path=False, markup=True)])
-log = logging.getLogger("wrapper_context_user")
-
-
-# --- Original Task Function (Example) ---
-async def async_task(id, delay):
-    log.debug(f"Task {id} starting (sleep {delay:.2f}s)")
-    await asyncio.sleep(delay)
-    if id == 'A-2': raise ValueError(f"Error in async {id}")
-    log.debug(f"Task {id} finished")
-    return f"Async Result {id}"
-
-
-# --- Main Orchestration using the AsyncProgressContext Wrapper ---
-async def main_with_context_wrapper():
-    # --- Progress Bar Columns (defined once) ---
-    progress_columns = [
-        SpinnerColumn(), TextColumn("[progress.description]{task.description}"),
-        BarColumn(), MofNCompleteColumn(), TimeElapsedColumn()
-    ]
-
-    # --- Create lists of COROUTINES ---
-    log.info("Preparing coroutines...")
-    coroutines_group_a = [async_task(f"A-{i}", random.random() * 0.6) for i in range(5)]
-    coroutines_group_b = [async_task(f"B-{i}", random.random() * 0.8) for i in range(7)]
-
-    # --- Use async with on the custom context wrapper ---
-    log.info("Entering async context with AsyncProgressContext...")
-    # Pass the column definitions etc. to the wrapper's constructor
-    async with AsyncProgressContext(*progress_columns, transient=False) as progress:
-        # 'progress' here is the actual rich.progress.Progress instance,
-        # started by AsyncProgressContext.__aenter__
-        log.info(f"Inside async context. Using Progress object ID: {id(progress)}")
-
-        log.info("Launching concurrent group processing...")
-        wrapper_results = await asyncio.gather(
-            run_coroutines_with_progress( # Use the version taking coroutines
-                coroutines_group_a, "Processing Group A", progress, return_exceptions=True
-            ),
-            run_coroutines_with_progress(
-                coroutines_group_b, "Processing Group B", progress, return_exceptions=True
-            ),
-            return_exceptions=True # For gather itself
-        )
-        log.info("Concurrent group processing finished within async context.")
-
-    # --- Exited async context, progress.stop() was called by __aexit__ ---
-    log.info("Exited async context.")
-
-    # --- Process results ---
-    log.info("Processing results...")
-    for i, group_result_or_exc in enumerate(wrapper_results):
-        group_name = f"Group {'A' if i == 0 else 'B'}"
-        if isinstance(group_result_or_exc, Exception):
-            log.error(f"{group_name} wrapper itself failed: {group_result_or_exc}")
-        else:
+
+# --- Run (example usage; nothing below is defined on import) ---
+if __name__ == "__main__":
+    import random
+    from rich.logging import RichHandler
+    from rich.console import Console
+    from rich.progress import SpinnerColumn, TextColumn, BarColumn, MofNCompleteColumn, TimeElapsedColumn
+
+    # --- Logger Setup (stderr recommended) ---
+    log_console = Console(stderr=True)
+    logging.basicConfig(level="INFO", format="%(message)s", datefmt="[%X]",
+                        handlers=[RichHandler(console=log_console, show_path=False, markup=True)])
+    log = logging.getLogger("wrapper_context_user")
+
+    # --- Original Task Function (Example) ---
+    async def async_task(id, delay):
+        log.debug(f"Task {id} starting (sleep {delay:.2f}s)")
+        await asyncio.sleep(delay)
+        if id == 'A-2': raise ValueError(f"Error in async {id}")
+        log.debug(f"Task {id} finished")
+        return f"Async Result {id}"
+
+    # --- Main Orchestration using the AsyncProgressContext Wrapper ---
+    async def main_with_context_wrapper():
+        # --- Progress Bar Columns (defined once) ---
+        progress_columns = [
+            SpinnerColumn(), TextColumn("[progress.description]{task.description}"),
+            BarColumn(), MofNCompleteColumn(), TimeElapsedColumn()
+        ]
+
+        # --- Create lists of COROUTINES ---
+        log.info("Preparing coroutines...")
+        # (factories: each coroutine is only created when it is about to run)
+        groups = {
+            "Processing Group A": [partial(async_task, f"A-{i}", random.random() * 0.6) for i in range(5)],
+            "Processing Group B": [partial(async_task, f"B-{i}", random.random() * 0.8) for i in range(7)],
+        }
+
+        # --- Use async with on the custom context wrapper ---
+        log.info("Entering async context with AsyncProgressContext...")
+        # Pass the column definitions etc. to the wrapper's constructor
+        async with AsyncProgressContext(*progress_columns, transient=False) as progress:
+            # 'progress' here is the actual rich.progress.Progress instance,
+            # started by AsyncProgressContext.__aenter__
+            log.info(f"Inside async context. Using Progress object ID: {id(progress)}")
+
+            log.info("Launching concurrent group processing...")
+            # The wrappers collect per-item exceptions themselves
+            wrapper_results = await run_tasks_with_progress(groups, progress, return_exceptions=True)
+            log.info("Concurrent group processing finished within async context.")
+
+        # --- Exited async context, progress.stop() was called by __aexit__ ---
+        log.info("Exited async context.")
+
+        # --- Process results ---
+        log.info("Processing results...")
+        for group_name, group_results in wrapper_results.items():
             log.info(f"Results for {group_name}:")
             exceptions_in_group = []
-            for item in group_result_or_exc:
+            for item in group_results:
                 if isinstance(item, Exception):
                     exceptions_in_group.append(item)
                     log.warning(f"  - Task Error: {item}")
@@ -233,9 +687,6 @@ async def main_with_context_wrapper():
             else:
                 log.info(f"  (All tasks succeeded in group)")
 
-    log.info("Main function finished.")
-
+        log.info("Main function finished.")
 
-# --- Run ---
-if __name__ == "__main__":
     asyncio.run(main_with_context_wrapper())
@@ -0,0 +1,254 @@
+import asyncio
+import contextvars
+import gc
+from functools import partial
+
+import pytest
+from rich.progress import Progress
+
+from src.utils.progress_bar import (
+    AsyncProgressContext, iter_with_progress, run_coroutines_with_progress, run_tasks_with_progress
+)
+
+
+class Boom(BaseException):
+    pass
+
+
+async def ok(value):
+    await asyncio.sleep(0)
+    return value
+
+
+async def fails(delay=0):
+    await asyncio.sleep(delay)
+    raise ValueError("failed")
+
+
+async def sleeps(delay, cancelled):
+    """Sleeps for delay seconds, recording in cancelled if it gets cancelled instead."""
+    try:
+        await asyncio.sleep(delay)
+    except asyncio.CancelledError:
+        cancelled.append(delay)
+        raise
+    return delay
+
+
+def run(coroutine_factory, timeout=2):
+    """Runs the wrapper call built by coroutine_factory(progress), failing instead of hanging."""
+    async def main():
+        with Progress(disable=True) as progress:
+            return await asyncio.wait_for(coroutine_factory(progress), timeout)
+    return asyncio.run(main())
+
+
+def test_task_cancelled_elsewhere_is_raised():
+    async def waits_on(fut):
+        return await fut
+
+    async def call(progress):
+        fut = asyncio.get_running_loop().create_future()
+        asyncio.get_running_loop().call_later(0.01, fut.cancel)
+        return await run_coroutines_with_progress(
+            [ok(1), waits_on(fut)], "cancelled", progress, return_exceptions=True
+        )
+
+    with pytest.raises(asyncio.CancelledError):
+        run(call)
+
+
+def test_base_exception_is_raised():
+    async def boom():
+        await asyncio.sleep(0)
+        raise Boom()
+
+    with pytest.raises(Boom):
+        run(lambda progress: run_coroutines_with_progress(
+            [ok(1), boom()], "boom", progress, return_exceptions=True
+        ))
+
+
+@pytest.mark.filterwarnings("error") # Also fails on "coroutine ... was never awaited"
+@pytest.mark.parametrize("max_concurrency", [0, -1])
+def test_max_concurrency_below_one_is_rejected(max_concurrency):
+    with pytest.raises(ValueError):
+        run(lambda progress: run_coroutines_with_progress(
+            [ok(1)], "window", progress, max_concurrency=max_concurrency
+        ))
+    gc.collect()
+
+
+@pytest.mark.filterwarnings("error")
+def test_rejected_input_closes_its_coroutines():
+    with pytest.raises(TypeError):
+        run(lambda progress: run_coroutines_with_progress([ok(1), 5], "invalid", progress))
+    with pytest.raises(TypeError):
+        run(lambda progress: run_tasks_with_progress(
+            {"a": [ok(1)], "b": [ok(2), 5], "c": [ok(3)]}, progress
+        ))
+    gc.collect()
+
+
+@pytest.mark.parametrize("max_concurrency", [None, 1])
+def test_failing_factory_is_that_items_outcome(max_concurrency):
+    results = run(lambda progress: run_coroutines_with_progress(
+        [partial(ok, 1), partial(ok), partial(ok, 3)], "factories", progress,
+        return_exceptions=True, max_concurrency=max_concurrency
+    ))
+    assert results[0] == 1 and results[2] == 3
+    assert isinstance(results[1], TypeError)
+
+
+@pytest.mark.parametrize("inline_sync", [False, True])
+def test_callable_returning_coroutine_is_awaited(inline_sync):
+    results = run(lambda progress: run_coroutines_with_progress(
+        [lambda: ok(7)], "lambdas", progress, inline_sync=inline_sync
+    ))
+    assert results == [7]
+
+
+def test_description_with_braces_shows_running_errors():
+    async def call(progress):
+        slow = asyncio.Event()
+        results = run_coroutines_with_progress(
+            [fails(), slow.wait()], "Load {fund}", progress, return_exceptions=True
+        )
+        task = asyncio.ensure_future(results)
+        await asyncio.sleep(0.1) # Past the refresh interval, with one item still running
+        description = progress.tasks[0].description
+        slow.set()
+        await task
+        return description
+
+    assert run(call) == "Load {fund} - 1 errors!"
+
+
+def test_results_are_in_input_order():
+    async def call(progress):
+        return await run_coroutines_with_progress(
+            [sleeps(0.03, []), sleeps(0.01, []), sleeps(0.02, [])], "order", progress
+        )
+
+    assert run(call) == [0.03, 0.01, 0.02]
+
+
+def test_first_failure_cancels_siblings():
+    cancelled = []
+
+    with pytest.raises(ValueError):
+        run(lambda progress: run_coroutines_with_progress(
+            [sleeps(10, cancelled), fails(), sleeps(10, cancelled)], "fail-fast", progress
+        ))
+    assert cancelled == [10, 10]
+
+
+def test_closing_iterator_early_cancels_running_tasks():
+    cancelled = []
+
+    async def call(progress):
+        iterator = iter_with_progress([ok(1), sleeps(10, cancelled), sleeps(10, cancelled)], "early", progress)
+        async for index, result in iterator:
+            assert (index, result) == (0, 1)
+            break
+        await iterator.aclose()
+        return progress.tasks[0].description
+
+    assert "stopped" in run(call)
+    assert cancelled == [10, 10]
+
+
+def test_max_concurrency_bounds_tasks_in_flight():
+    in_flight = peak = 0
+
+    async def item(i):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.001)
+        in_flight -= 1
+        return i
+
+    results = run(lambda progress: run_coroutines_with_progress(
+        [partial(item, i) for i in range(20)], "window", progress, max_concurrency=3
+    ))
+    assert results == list(range(20))
+    assert peak == 3
+
+
+def test_refreshes_go_through_the_coalescer_inside_async_progress_context():
+    async def main():
+        async with AsyncProgressContext(disable=True) as progress:
+            release = asyncio.Event()
+            call = asyncio.ensure_future(run_coroutines_with_progress(
+                [ok(1), ok(2), release.wait()], "coalesced", progress
+            ))
+            await asyncio.sleep(0.2) # Several coalescer ticks, one item still running
+            running = progress.tasks[0].completed
+            release.set()
+            results = await call
+            return running, progress.tasks[0], results
+
+    running, task, results = asyncio.run(main())
+    assert running == 2
+    assert task.completed == 3
+    assert task.description == "[green]✓ coalesced (3/3 success)"
+    assert results == [1, 2, True]
+
+
+def test_run_tasks_with_progress_returns_results_per_group():
+    results = run(lambda progress: run_tasks_with_progress(
+        {"a": [ok(1), ok(2)], "b": [partial(ok, 3)], "c": []}, progress
+    ))
+    assert results == {"a": [1, 2], "b": [3], "c": []}
+
+
+def test_failure_in_one_group_stops_the_others():
+    cancelled = []
+
+    async def call(progress):
+        with pytest.raises(ValueError):
+            await run_tasks_with_progress(
+                {"a": [ok(1), sleeps(10, cancelled)], "b": [fails(0.01)]}, progress
+            )
+        return [task.description for task in progress.tasks]
+
+    descriptions = run(call)
+    assert descriptions[0] == "[yellow]■ a (stopped, 1/2 success)"
+    assert descriptions[1].startswith("[red]✗ b (1 errors")
+    assert cancelled == [10]
+
+
+@pytest.mark.parametrize("eager_start", [False, True])
+def test_eager_start_runs_items_inside_the_launching_call(eager_start):
+    order = []
+
+    async def item():
+        order.append("item")
+        return 1
+
+    async def call(progress):
+        asyncio.get_running_loop().call_soon(order.append, "soon")
+        return await run_coroutines_with_progress([item()], "eager", progress, eager_start=eager_start)
+
+    assert run(call) == [1]
+    assert order[0] == ("item" if eager_start else "soon")
+
+
+@pytest.mark.parametrize("share_context", [False, True])
+def test_share_context_runs_tasks_in_one_context(share_context):
+    var = contextvars.ContextVar("var")
+
+    async def item():
+        await asyncio.sleep(0)
+        return asyncio.current_task().get_context(), var.get()
+
+    async def call(progress):
+        var.set("caller")
+        return await run_coroutines_with_progress(
+            [item() for _ in range(3)], "context", progress, share_context=share_context
+        )
+
+    outcomes = run(call)
+    assert [value for _, value in outcomes] == ["caller"] * 3
+    assert len({id(context) for context, _ in outcomes}) == (1 if share_context else 3)